@@ -1,4 +1,9 @@
+import functools
 import random
+import re
+import multiprocessing
+import os
+import zipfile
 from pathlib import Path
 from datetime import datetime
 import chess
@@ -6,23 +11,63 @@ import chess.engine
 import chess.svg
 import time
 
-# For PNG conversion
+# For PNG conversion (resvg is native and much faster, cairosvg is the fallback)
+try:
+    import resvg_py
+    HAS_RESVG = True
+except ImportError:
+    HAS_RESVG = False
+
+# cairosvg raises OSError when the native Cairo library is missing (common on Windows)
 try:
     import cairosvg
     HAS_CAIRO = True
-except ImportError:
+except (ImportError, OSError):
     HAS_CAIRO = False
-    print("⚠️  Install cairosvg for PNG export: pip install cairosvg")
+
+HAS_PNG = HAS_RESVG or HAS_CAIRO
+if not HAS_PNG:
+    print("⚠️  Install resvg-py or cairosvg for PNG export: pip install resvg-py")
 
 # ===== CONFIGURATION =====
 STOCKFISH_PATH = Path("stockfish.exe")  # Stockfish in same folder
 OUTPUT_DIR = Path("generated_puzzles")
-EXPORT_PNG = True
+EXPORT_PNG = False  # PNGs on demand: run render_pngs.py before posting
 NUM_PUZZLES = 200  # Number of puzzles to generate
+NUM_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Parallel Stockfish processes
 
 # Stockfish analysis settings
-ANALYSIS_TIME = 2.0  # seconds per position
-MATE_DEPTH = 10  # depth to search for mates
+ANALYSIS_TIME = 2.0  # max seconds per position (mate search usually stops sooner)
+ENGINE_HASH_TOTAL_MB = 1024  # transposition table budget shared by all workers
+ENGINE_HASH_MB = max(16, ENGINE_HASH_TOTAL_MB // NUM_WORKERS)  # per worker
+# Threads per Stockfish. Independent positions scale better across NUM_WORKERS
+# single-threaded engines than across threads of one engine, so keep this at 1
+# and raise it only when running with NUM_WORKERS = 1.
+ENGINE_THREADS = 1
+PREFILTER_DEPTH = 6  # by this depth a quiet position is dropped from the mate search
+PREFILTER_MIN_CP = 300  # eval swing (centipawns) that keeps the mate search going
+# Stop the mate search if no mate shows up by this depth. Must be well past
+# PREFILTER_DEPTH: Stockfish's nominal depth includes reductions, so real
+# mate-in-3s often only surface a few plies deeper than the pre-filter sees.
+MATE_GIVE_UP_DEPTH = PREFILTER_DEPTH + 4
+
+# Board rendering (same geometry as chess.svg: 45px squares, 15px coordinate margin)
+SQUARE_SIZE = 45
+BOARD_MARGIN = 15
+LIGHT_COLOR = "#f0d9b5"
+DARK_COLOR = "#b58863"
+LASTMOVE_LIGHT_COLOR = "#cdd16a"
+LASTMOVE_DARK_COLOR = "#aaa23b"
+MARGIN_COLOR = "#212121"
+COORD_COLOR = "#e5e5e5"
+COORD_GLYPH_MARGIN = 20  # chess.svg.COORDS glyphs are drawn for a 20px margin
+
+# Piece glyphs are identical on every board, so serialize them once
+PIECE_DEFS = "<defs>" + "".join(chess.svg.PIECES.values()) + "</defs>"
+PIECE_IDS = {
+    piece.symbol(): f"{chess.COLOR_NAMES[piece.color]}-{chess.PIECE_NAMES[piece.piece_type]}"
+    for piece in (chess.Piece(piece_type, color) for color in chess.COLORS for piece_type in chess.PIECE_TYPES)
+}
 
 # ===== HELPER FUNCTIONS =====
 def get_title_text(board, mate_in):
@@ -32,73 +77,127 @@ def get_title_text(board, mate_in):
         return f"{color} to move and mate in {mate_in}"
     return f"{color} to move and win"
 
-def svg_to_png(svg_file, png_file):
-    """Convert SVG to PNG for social media"""
-    if not HAS_CAIRO:
-        return False
+def svg_to_png(svg_content):
+    """Convert SVG to PNG bytes for social media (None on failure)"""
+    if not HAS_PNG:
+        return None
     
     try:
-        cairosvg.svg2png(url=str(svg_file), write_to=str(png_file), scale=2)
-        return True
+        if HAS_RESVG:
+            return bytes(resvg_py.svg_to_bytes(svg_string=svg_content, zoom=2))
+        return cairosvg.svg2png(bytestring=svg_content.encode("utf-8"), scale=2)
     except Exception as e:
         print(f"    ❌ PNG conversion failed: {e}")
-        return False
+        return None
+
+def square_position(square, orientation):
+    """Top-left corner of a square on the board grid"""
+    file_index = chess.square_file(square)
+    rank_index = chess.square_rank(square)
+    if orientation == chess.WHITE:
+        x, y = file_index, 7 - rank_index
+    else:
+        x, y = 7 - file_index, rank_index
+    return BOARD_MARGIN + x * SQUARE_SIZE, BOARD_MARGIN + y * SQUARE_SIZE
+
+def square_rect(square, orientation, light_color, dark_color):
+    """SVG rect for one square, colored by its shade"""
+    x, y = square_position(square, orientation)
+    color = light_color if chess.BB_SQUARES[square] & chess.BB_LIGHT_SQUARES else dark_color
+    return f'<rect x="{x}" y="{y}" width="{SQUARE_SIZE}" height="{SQUARE_SIZE}" fill="{color}" />'
+
+def coord_glyph(name, x, y, width, height, horizontal):
+    """Coordinate label drawn with chess.svg's path glyphs, so no font is needed"""
+    scale = BOARD_MARGIN / COORD_GLYPH_MARGIN
+    if horizontal:
+        x += int(width - scale * width) // 2
+    else:
+        y += int(height - scale * height) // 2
+    return (f'<g transform="translate({x}, {y}) scale({scale}, {scale})" '
+            f'fill="{COORD_COLOR}" stroke="{COORD_COLOR}">{chess.svg.COORDS[name]}</g>')
+
+@functools.lru_cache(maxsize=None)
+def board_frame(orientation, size):
+    """Everything on a board image that doesn't depend on the position.
+    
+    Returns (head, body, tail): the title goes between head and body, the
+    last-move highlight and pieces between body and tail.
+    """
+    full_size = 8 * SQUARE_SIZE + 2 * BOARD_MARGIN
+    
+    head = "\n".join([
+        f'<svg width="{size}" height="{size + 40}" xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">',
+        PIECE_DEFS,
+        f'<text x="{size//2}" y="25" text-anchor="middle" font-size="18" '
+        f'font-family="Arial, sans-serif" fill="white" font-weight="bold">',
+    ])
+    
+    body = [
+        "</text>",
+        f'<svg x="0" y="40" width="{size}" height="{size}" viewBox="0 0 {full_size} {full_size}">',
+        f'<rect x="0" y="0" width="{full_size}" height="{full_size}" fill="{MARGIN_COLOR}" />',
+    ]
+    
+    # Squares
+    for square in chess.SQUARES:
+        body.append(square_rect(square, orientation, LIGHT_COLOR, DARK_COLOR))
+    
+    # Coordinates on all four sides, laid out like chess.svg.board
+    for i in range(8):
+        file_name = chess.FILE_NAMES[i if orientation == chess.WHITE else 7 - i]
+        rank_name = chess.RANK_NAMES[7 - i if orientation == chess.WHITE else i]
+        offset = BOARD_MARGIN + i * SQUARE_SIZE
+        # Top row keeps 1px of padding to separate the ascenders from the edge
+        for edge in (1, full_size - BOARD_MARGIN):
+            body.append(coord_glyph(file_name, offset, edge, SQUARE_SIZE, BOARD_MARGIN, horizontal=True))
+        for edge in (0, full_size - BOARD_MARGIN):
+            body.append(coord_glyph(rank_name, edge, offset, BOARD_MARGIN, SQUARE_SIZE, horizontal=False))
+    
+    return head, "\n".join(body) + "\n", "\n</svg>\n</svg>"
 
 def create_board_svg_with_title(board, title, last_move=None, orientation=chess.WHITE, size=400):
     """Create SVG with title above the board"""
-    board_svg = chess.svg.board(
-        board,
-        size=size,
-        lastmove=last_move,
-        orientation=orientation,
-        colors={"square light": "#f0d9b5", "square dark": "#b58863"}
-    )
+    head, body, tail = board_frame(orientation, size)
+    parts = [head, title, body]
+    
+    if last_move:
+        for square in (last_move.from_square, last_move.to_square):
+            parts.append(square_rect(square, orientation, LASTMOVE_LIGHT_COLOR, LASTMOVE_DARK_COLOR))
     
-    svg_with_title = f'''<svg width="{size}" height="{size + 40}" xmlns="http://www.w3.org/2000/svg">
-  <text x="{size//2}" y="25" text-anchor="middle" font-size="18"
-        font-family="Arial, sans-serif" fill="white" font-weight="bold">
-    {title}
-  </text>
-  
-  <g transform="translate(0,40)">
-    {board_svg}
-  </g>
-</svg>'''
-    return svg_with_title
+    # Pieces reference the shared glyph definitions
+    for square, piece in board.piece_map().items():
+        x, y = square_position(square, orientation)
+        href = f"#{PIECE_IDS[piece.symbol()]}"
+        parts.append(f'<use href="{href}" xlink:href="{href}" transform="translate({x}, {y})" />')
+    
+    parts.append(tail)
+    return "".join(parts)
 
-def generate_random_game(max_moves=40):
-    """Generate a random chess game to create puzzle positions"""
-    board = chess.Board()
+def generate_random_game(board, max_moves=40):
+    """Play a random chess game on board (reset in place) to create puzzle positions"""
+    board.reset()
     moves_played = 0
     
-    while not board.is_game_over() and moves_played < max_moves:
+    # Draw rules don't matter here, so only stop when there are no legal moves
+    while moves_played < max_moves:
         # Play semi-random moves (weighted towards center and development)
         legal_moves = list(board.legal_moves)
         
         if not legal_moves:
             break
         
-        # Weight moves by basic heuristics
-        move_scores = []
-        for move in legal_moves:
-            score = random.random()
-            
-            # Prefer captures
-            if board.is_capture(move):
-                score += 1.0
-            
-            # Prefer center moves in opening
-            if moves_played < 10:
-                to_square = move.to_square
-                if chess.square_file(to_square) in [3, 4] and chess.square_rank(to_square) in [3, 4]:
-                    score += 0.5
-            
-            move_scores.append((score, move))
+        # Weight moves by basic heuristics:
+        # prefer captures, and center squares (d4/e4/d5/e5) in the opening
+        in_opening = moves_played < 10
+        weights = [
+            random.random()
+            + (1.0 if board.is_capture(move) else 0.0)
+            + (0.5 if in_opening and chess.BB_SQUARES[move.to_square] & chess.BB_CENTER else 0.0)
+            for move in legal_moves
+        ]
         
-        # Choose move with some randomness
-        move_scores.sort(reverse=True)
-        top_moves = move_scores[:min(5, len(move_scores))]
-        chosen_move = random.choice(top_moves)[1]
+        # Sample a move in proportion to its weight
+        chosen_move = random.choices(legal_moves, weights=weights, k=1)[0]
         
         board.push(chosen_move)
         moves_played += 1
@@ -106,16 +205,58 @@ def generate_random_game(max_moves=40):
     return board
 
 def analyze_for_mate(engine, board, max_mate=3):
-    """Check if position has mate in 2 or 3"""
+    """Check if position has a unique mate in 2 or 3"""
+    in_check = board.is_check()
+    
     try:
-        info = engine.analyse(board, chess.engine.Limit(depth=MATE_DEPTH))
-        score = info.get("score")
+        # Top two lines: the best one is the solution, the second one
+        # tells us whether another move mates just as fast
+        # go mate N stops as soon as a forced mate is proven
+        limit = chess.engine.Limit(mate=max_mate, time=ANALYSIS_TIME)
+        with engine.analysis(board, limit, multipv=2) as analysis:
+            for update in analysis:
+                # Only the main line decides whether to keep searching
+                update_score = update.get("score")
+                if update.get("multipv", 1) != 1 or not update_score:
+                    continue
+                
+                depth = update.get("depth", 0)
+                
+                # go mate N doesn't stop on mates that can't become a puzzle
+                mate = update_score.relative.mate()
+                if mate is not None:
+                    # The side to move is the one getting mated
+                    if mate <= 0:
+                        return None, None
+                    # Still only a mate longer than max_mate this deep
+                    if mate > max_mate and depth >= MATE_GIVE_UP_DEPTH:
+                        return None, None
+                    continue
+                
+                # Quiet position: no big eval swing by the pre-filter depth
+                if (depth >= PREFILTER_DEPTH and not in_check
+                        and abs(update_score.relative.score()) <= PREFILTER_MIN_CP):
+                    return None, None
+                
+                # Searched deep enough without finding a mate
+                if depth >= MATE_GIVE_UP_DEPTH:
+                    return None, None
+            info = analysis.multipv
         
-        if score and score.white().is_mate():
-            mate_in = abs(score.white().mate())
+        score = info[0].get("score")
+        
+        # Scores from the side to move, so a positive mate is ours
+        if score and score.relative.is_mate() and score.relative.mate() > 0:
+            mate_in = score.relative.mate()
             if mate_in <= max_mate:
+                # Reject puzzles with a second mating line of equal or shorter length
+                if len(info) > 1:
+                    alt_score = info[1].get("score")
+                    if alt_score and alt_score.relative.is_mate() and 0 < alt_score.relative.mate() <= mate_in:
+                        return None, None
+                
                 # Get the principal variation (solution)
-                pv = info.get("pv", [])
+                pv = info[0].get("pv", [])
                 if len(pv) >= mate_in * 2 - 1:  # Enough moves for mate
                     return mate_in, pv[:mate_in * 2]
         
@@ -125,12 +266,15 @@ def analyze_for_mate(engine, board, max_mate=3):
 
 def find_puzzle_position(engine, max_attempts=50):
     """Generate random positions until we find one with mate in 2 or 3"""
+    # One board reused for every attempt instead of allocating a new one
+    board = chess.Board()
+    
     for attempt in range(max_attempts):
         # Generate random game
-        board = generate_random_game(random.randint(15, 35))
+        generate_random_game(board, random.randint(15, 35))
         
-        # Skip if game is over
-        if board.is_game_over():
+        # Skip checkmate / stalemate (cheaper than is_game_over's draw checks)
+        if not board.legal_moves:
             continue
         
         # Analyze position
@@ -141,16 +285,45 @@ def find_puzzle_position(engine, max_attempts=50):
     
     return None, None, None
 
+# ===== WORKER PROCESSES =====
+_engine = None  # Stockfish instance owned by the current pool worker
+_engine_error = None  # Why _engine failed to start, reported by search_one
+
+def init_worker():
+    """Start the Stockfish instance for this pool worker"""
+    global _engine, _engine_error
+    # Never raise here: a failing initializer makes the pool respawn workers forever
+    try:
+        _engine = chess.engine.SimpleEngine.popen_uci(str(STOCKFISH_PATH))
+        _engine.configure({"Threads": ENGINE_THREADS, "Hash": ENGINE_HASH_MB})
+    except Exception as e:
+        _engine_error = str(e)
+        if _engine:
+            _engine.quit()
+        _engine = None
+
+def search_one(seed):
+    """Search for one puzzle in a worker, returns (fen, mate_in, uci_moves)"""
+    if _engine is None:
+        raise RuntimeError(f"Stockfish failed to start in worker: {_engine_error}")
+    
+    random.seed(seed)
+    board, mate_in, solution = find_puzzle_position(_engine, max_attempts=50)
+    
+    if board and mate_in and solution:
+        return board.fen(), mate_in, [m.uci() for m in solution]
+    return None, None, None
+
 def save_puzzle(puzzle_data, puzzle_number, output_dir, export_png=True):
-    """Save puzzle to files"""
+    """Save puzzle as a single ZIP archive"""
     board = puzzle_data['board']
     mate_in = puzzle_data['mate_in']
     solution = puzzle_data['solution']
     
-    # Create puzzle directory
+    # One archive per puzzle instead of a folder of small files
     base_name = f"day{puzzle_number:03d}_generated"
-    puzzle_dir = output_dir / base_name
-    puzzle_dir.mkdir(exist_ok=True)
+    puzzle_zip = output_dir / f"{base_name}.zip"
+    images = {}  # archive name (without extension) -> SVG content
     
     # Determine orientation
     board_orientation = board.turn
@@ -159,17 +332,15 @@ def save_puzzle(puzzle_data, puzzle_number, output_dir, export_png=True):
     title_text = get_title_text(board, mate_in)
     
     # Save FEN and solution
-    fen_file = puzzle_dir / "puzzle_data.txt"
-    with open(fen_file, "w", encoding="utf-8") as f:
-        f.write(f"FEN: {board.fen()}\n")
-        f.write(f"Mate in: {mate_in}\n")
-        f.write(f"Solution (UCI): {' '.join([m.uci() for m in solution])}\n\n")
+    parts = []
+    parts.append(f"FEN: {board.fen()}\n")
+    parts.append(f"Mate in: {mate_in}\n")
+    parts.append(f"Solution (UCI): {' '.join([m.uci() for m in solution])}\n\n")
     
-    # === GENERATE PUZZLE IMAGE ===
-    puzzle_svg = puzzle_dir / "puzzle.svg"
-    puzzle_png = puzzle_dir / "puzzle.png"
+    puzzle_text = "".join(parts)
     
-    puzzle_svg_content = create_board_svg_with_title(
+    # === GENERATE PUZZLE IMAGE ===
+    images["puzzle"] = create_board_svg_with_title(
         board,
         title_text,
         last_move=None,
@@ -177,21 +348,20 @@ def save_puzzle(puzzle_data, puzzle_number, output_dir, export_png=True):
         size=400
     )
     
-    with open(puzzle_svg, "w", encoding="utf-8") as f:
-        f.write(puzzle_svg_content)
-    
-    if export_png and HAS_CAIRO:
-        svg_to_png(puzzle_svg, puzzle_png)
-    
     # === GENERATE STEP-BY-STEP SOLUTION IMAGES ===
-    solution_san = []
-    solve_board = board.copy()
+    solve_board = board.copy(stack=False)  # replaying the solution needs no history
     
-    for i, move in enumerate(solution):
+    # SAN for the whole line in one pass, stripping the "1." / "30..." move
+    # numbers (when Black moves first they're glued to the move: "30...Ra1#")
+    try:
+        tokens = (re.sub(r"^\d+\.+", "", token) for token in board.variation_san(solution).split())
+        solution_san = [token for token in tokens if token]
+    except ValueError as e:
+        print(f"    ⚠️  Invalid solution line: {e}")
+        solution_san = []
+    
+    for i, (san_notation, move) in enumerate(zip(solution_san, solution)):
         try:
-            san_notation = solve_board.san(move)
-            solution_san.append(san_notation)
-            
             move_color = "White" if solve_board.turn == chess.WHITE else "Black"
             solve_board.push(move)
             
@@ -205,7 +375,7 @@ def save_puzzle(puzzle_data, puzzle_number, output_dir, export_png=True):
             else:
                 step_title = f"Step {step_num}: {move_color} plays {san_notation}"
             
-            step_svg_content = create_board_svg_with_title(
+            images[f"solution_step{step_num}"] = create_board_svg_with_title(
                 solve_board,
                 step_title,
                 last_move=move,
@@ -213,61 +383,71 @@ def save_puzzle(puzzle_data, puzzle_number, output_dir, export_png=True):
                 size=400
             )
             
-            step_svg = puzzle_dir / f"solution_step{step_num}.svg"
-            step_png = puzzle_dir / f"solution_step{step_num}.png"
-            
-            with open(step_svg, "w", encoding="utf-8") as f:
-                f.write(step_svg_content)
-            
-            if export_png and HAS_CAIRO:
-                svg_to_png(step_svg, step_png)
-                
         except Exception as e:
             print(f"    ⚠️  Error at move {i+1}: {e}")
             break
     
     # === GENERATE TWEET TEXT ===
     solution_text = " ".join(solution_san)
-    tweet_file = puzzle_dir / "tweet.txt"
-    
-    with open(tweet_file, "w", encoding="utf-8") as f:
-        f.write("=" * 60 + "\n")
-        f.write("TWEET 1: PUZZLE (Main Tweet)\n")
-        f.write("=" * 60 + "\n")
-        f.write(f"Attach: puzzle.png\n\n")
-        f.write(f"🧩 Daily Chess Puzzle #{puzzle_number}\n\n")
-        f.write(f"{title_text}\n")
-        f.write(f"Generated by Stockfish AI ⭐\n\n")
-        f.write("Can you solve it? 🤔\n\n")
-        f.write("#ChessPuzzle #Chess #Tactics\n\n")
+    
+    parts = []
+    parts.append("=" * 60 + "\n")
+    parts.append("TWEET 1: PUZZLE (Main Tweet)\n")
+    parts.append("=" * 60 + "\n")
+    parts.append(f"Attach: puzzle.png\n\n")
+    parts.append(f"🧩 Daily Chess Puzzle #{puzzle_number}\n\n")
+    parts.append(f"{title_text}\n")
+    parts.append(f"Generated by Stockfish AI ⭐\n\n")
+    parts.append("Can you solve it? 🤔\n\n")
+    parts.append("#ChessPuzzle #Chess #Tactics\n\n")
+    
+    parts.append("=" * 60 + "\n")
+    parts.append("TWEET 2: SOLUTION SUMMARY\n")
+    parts.append("=" * 60 + "\n")
+    parts.append(f"✅ Solution: {solution_text}\n\n")
+    parts.append("See step-by-step images below! 👇\n\n")
+    
+    parts.append("=" * 60 + "\n")
+    parts.append("TWEETS 3+: STEP-BY-STEP THREAD\n")
+    parts.append("=" * 60 + "\n")
+    for i, san in enumerate(solution_san):
+        step_num = i + 1
+        move_color = "White" if i % 2 == 0 else "Black"
+        is_checkmate = "#" in san
         
-        f.write("=" * 60 + "\n")
-        f.write("TWEET 2: SOLUTION SUMMARY\n")
-        f.write("=" * 60 + "\n")
-        f.write(f"✅ Solution: {solution_text}\n\n")
-        f.write("See step-by-step images below! 👇\n\n")
+        parts.append(f"\nTweet {step_num + 2}:\n")
+        if is_checkmate:
+            parts.append(f"✓ {move_color}: {san} - Checkmate!\n")
+        else:
+            parts.append(f"{move_color}: {san}\n")
         
-        f.write("=" * 60 + "\n")
-        f.write("TWEETS 3+: STEP-BY-STEP THREAD\n")
-        f.write("=" * 60 + "\n")
-        for i, san in enumerate(solution_san):
-            step_num = i + 1
-            move_color = "White" if i % 2 == 0 else "Black"
-            is_checkmate = "#" in san
-            
-            f.write(f"\nTweet {step_num + 2}:\n")
-            if is_checkmate:
-                f.write(f"✓ {move_color}: {san} - Checkmate!\n")
-            else:
-                f.write(f"{move_color}: {san}\n")
-            
-            f.write(f"[Attach: solution_step{step_num}.png]\n\n")
+        parts.append(f"[Attach: solution_step{step_num}.png]\n\n")
+    
+    tweet_text = "".join(parts)
+    
+    # === RASTERIZE PNGS ===
+    # Done inline: Stockfish runs in the pool workers, and this process
+    # has the one core they leave free
+    pngs = []
+    if export_png and HAS_PNG:
+        pngs = [svg_to_png(svg_content) for svg_content in images.values()]
+    
+    # === WRITE ARCHIVE ===
+    # Stored, not deflated: PNGs are already compressed and SVGs are small
+    with zipfile.ZipFile(puzzle_zip, "w", compression=zipfile.ZIP_STORED) as zf:
+        zf.writestr("puzzle_data.txt", puzzle_text)
+        zf.writestr("tweet.txt", tweet_text)
+        for name, svg_content in images.items():
+            zf.writestr(f"{name}.svg", svg_content)
+        for name, png_bytes in zip(images, pngs):
+            if png_bytes:
+                zf.writestr(f"{name}.png", png_bytes)
     
     return {
         'success': True,
         'mate_in': mate_in,
         'solution_moves': len(solution_san),
-        'folder': puzzle_dir
+        'archive': puzzle_zip
     }
 
 # ===== MAIN EXECUTION =====
@@ -288,17 +468,22 @@ def main():
     # Setup output directory
     OUTPUT_DIR.mkdir(exist_ok=True)
     
-    # Initialize Stockfish
+    # Check that Stockfish starts before spawning workers
     print(f"\n🔧 Initializing Stockfish engine...")
     try:
         engine = chess.engine.SimpleEngine.popen_uci(str(STOCKFISH_PATH))
+        try:
+            # Same settings the workers use, so bad values fail here
+            engine.configure({"Threads": ENGINE_THREADS, "Hash": ENGINE_HASH_MB})
+        finally:
+            engine.quit()
         print(f"✅ Stockfish initialized: {engine.id.get('name', 'Unknown')}")
     except Exception as e:
         print(f"❌ Failed to initialize Stockfish: {e}")
         return
     
     # Generate puzzles
-    print(f"\n🔄 Starting puzzle generation...\n")
+    print(f"\n🔄 Starting puzzle generation with {NUM_WORKERS} Stockfish workers...\n")
     
     results = {
         'success': [],
@@ -309,54 +494,66 @@ def main():
     attempts = 0
     max_total_attempts = NUM_PUZZLES * 100  # Prevent infinite loop
     
-    while puzzle_count < NUM_PUZZLES and attempts < max_total_attempts:
-        attempts += 1
-        
-        print(f"[{puzzle_count + 1}/{NUM_PUZZLES}] Searching for puzzle position (attempt {attempts})...")
-        
+    # Fresh seeds each run so batches don't repeat puzzles
+    first_seed = random.randrange(2**32)
+    seeds = range(first_seed, first_seed + max_total_attempts)
+    
+    # Workers keep searching the next positions while this process saves
+    # puzzles, so Stockfish is never idle waiting on file or PNG work
+    with multiprocessing.Pool(NUM_WORKERS, initializer=init_worker) as pool:
         try:
-            # Find a puzzle position
-            board, mate_in, solution = find_puzzle_position(engine, max_attempts=50)
-            
-            if board and mate_in and solution:
-                puzzle_count += 1
-                
-                print(f"    ✅ Found mate in {mate_in}!")
+            for fen, mate_in, moves in pool.imap_unordered(search_one, seeds, chunksize=4):
+                attempts += 1
                 
-                # Save the puzzle
-                puzzle_data = {
-                    'board': board,
-                    'mate_in': mate_in,
-                    'solution': solution
-                }
+                if not fen:
+                    print(f"[{puzzle_count + 1}/{NUM_PUZZLES}] ⏭️  No puzzle found (attempt {attempts}), trying again...")
+                    continue
                 
-                result = save_puzzle(
-                    puzzle_data=puzzle_data,
-                    puzzle_number=puzzle_count,
-                    output_dir=OUTPUT_DIR,
-                    export_png=EXPORT_PNG
-                )
-                
-                results['success'].append(result)
-                print(f"    📁 Saved to: {result['folder'].name}/")
-                
-                # Progress indicator
-                if puzzle_count % 10 == 0:
-                    elapsed = time.time() - start_time
-                    avg_time = elapsed / puzzle_count
-                    remaining = (NUM_PUZZLES - puzzle_count) * avg_time
-                    print(f"\n📊 Progress: {puzzle_count}/{NUM_PUZZLES} ({puzzle_count/NUM_PUZZLES*100:.1f}%)")
-                    print(f"⏱️  Elapsed: {elapsed:.1f}s | Estimated remaining: {remaining:.1f}s")
-                    print(f"🎲 Total attempts: {attempts}\n")
-            else:
-                print(f"    ⏭️  No puzzle found, trying again...")
+                try:
+                    puzzle_count += 1
+                    
+                    print(f"[{puzzle_count}/{NUM_PUZZLES}] ✅ Found mate in {mate_in}! (attempt {attempts})")
+                    
+                    # Save the puzzle
+                    puzzle_data = {
+                        'board': chess.Board(fen),
+                        'mate_in': mate_in,
+                        'solution': [chess.Move.from_uci(m) for m in moves]
+                    }
+                    
+                    result = save_puzzle(
+                        puzzle_data=puzzle_data,
+                        puzzle_number=puzzle_count,
+                        output_dir=OUTPUT_DIR,
+                        export_png=EXPORT_PNG
+                    )
+                    
+                    results['success'].append(result)
+                    print(f"    📁 Saved to: {result['archive'].name}")
+                    
+                    # Progress indicator
+                    if puzzle_count % 10 == 0:
+                        elapsed = time.time() - start_time
+                        avg_time = elapsed / puzzle_count
+                        remaining = (NUM_PUZZLES - puzzle_count) * avg_time
+                        print(f"\n📊 Progress: {puzzle_count}/{NUM_PUZZLES} ({puzzle_count/NUM_PUZZLES*100:.1f}%)")
+                        print(f"⏱️  Elapsed: {elapsed:.1f}s | Estimated remaining: {remaining:.1f}s")
+                        print(f"🎲 Total attempts: {attempts}\n")
+                        
+                except Exception as e:
+                    print(f"    ❌ Error: {e}")
+                    results['failed'].append({'error': str(e)})
                 
+                if puzzle_count >= NUM_PUZZLES:
+                    break
+        
         except Exception as e:
-            print(f"    ❌ Error: {e}")
+            # A worker could not search at all (e.g. Stockfish failed to start)
+            print(f"\n❌ Worker error: {e}")
             results['failed'].append({'error': str(e)})
-    
-    # Close engine
-    engine.quit()
+        
+        # Stop workers still searching for surplus puzzles
+        pool.terminate()
     
     # Final summary
     end_time = time.time()
@@ -373,21 +570,24 @@ def main():
     
     # Generate master index
     index_file = OUTPUT_DIR / "puzzle_index.txt"
+    parts = []
+    parts.append("STOCKFISH GENERATED PUZZLE COLLECTION\n")
+    parts.append("="*70 + "\n\n")
+    parts.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    parts.append(f"Total Puzzles: {len(results['success'])}\n")
+    parts.append(f"Engine: Stockfish\n\n")
+    parts.append("="*70 + "\n")
+    parts.append("PUZZLE LIST:\n")
+    parts.append("="*70 + "\n\n")
+    
+    for i, result in enumerate(results['success'], start=1):
+        parts.append(f"Day {i:03d}:\n")
+        parts.append(f"  Mate in: {result['mate_in']}\n")
+        parts.append(f"  Solution Moves: {result['solution_moves']}\n")
+        parts.append(f"  Archive: {result['archive'].name}\n\n")
+    
     with open(index_file, "w", encoding="utf-8") as f:
-        f.write("STOCKFISH GENERATED PUZZLE COLLECTION\n")
-        f.write("="*70 + "\n\n")
-        f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"Total Puzzles: {len(results['success'])}\n")
-        f.write(f"Engine: Stockfish\n\n")
-        f.write("="*70 + "\n")
-        f.write("PUZZLE LIST:\n")
-        f.write("="*70 + "\n\n")
-        
-        for i, result in enumerate(results['success'], start=1):
-            f.write(f"Day {i:03d}:\n")
-            f.write(f"  Mate in: {result['mate_in']}\n")
-            f.write(f"  Solution Moves: {result['solution_moves']}\n")
-            f.write(f"  Folder: {result['folder'].name}\n\n")
+        f.write("".join(parts))
     
     print(f"\n📋 Master index saved to: {index_file}")
     print(f"\n✅ All done! Ready for {len(results['success'])} days of Twitter posts! 🐦♟️")
@@ -0,0 +1,69 @@
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from main import OUTPUT_DIR, HAS_PNG, svg_to_png
+
+# ===== HELPER FUNCTIONS =====
+def missing_pngs(archive):
+    """SVG entries of a puzzle archive that don't have a PNG yet (name -> content)"""
+    with zipfile.ZipFile(archive) as zf:
+        names = set(zf.namelist())
+        return {
+            name: zf.read(name).decode("utf-8")
+            for name in sorted(names)
+            if name.endswith(".svg") and name[:-4] + ".png" not in names
+        }
+
+# ===== MAIN EXECUTION =====
+def main():
+    print("="*70)
+    print("🖼️  CHESS PUZZLE GENERATOR - PNG RENDERING")
+    print("="*70)
+    
+    if not HAS_PNG:
+        print("\n❌ ERROR: No PNG backend available")
+        print("Please install one: pip install resvg-py (or cairosvg)")
+        return
+    
+    archives = sorted(OUTPUT_DIR.glob("*.zip"))
+    if not archives:
+        print(f"\n❌ No puzzle archives found in {OUTPUT_DIR.absolute()}")
+        return
+    
+    start_time = time.time()
+    
+    # Collect every SVG still waiting for a PNG
+    pending = {}
+    for archive in archives:
+        entries = missing_pngs(archive)
+        if entries:
+            pending[archive] = entries
+    
+    total = sum(len(entries) for entries in pending.values())
+    print(f"\n🔄 Rendering {total} PNGs from {len(pending)} of {len(archives)} archives...\n")
+    
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        # Results come back in submission order, so each archive takes its
+        # own PNGs off the front of the shared iterator
+        pngs = executor.map(svg_to_png, [svg for entries in pending.values() for svg in entries.values()], chunksize=8)
+        
+        for archive, entries in pending.items():
+            with zipfile.ZipFile(archive, "a", compression=zipfile.ZIP_STORED) as zf:
+                for name, png_bytes in zip(entries, pngs):
+                    if png_bytes:
+                        zf.writestr(name[:-4] + ".png", png_bytes)
+                        rendered += 1
+            print(f"    ✅ {archive.name}")
+    
+    total_time = time.time() - start_time
+    
+    print("\n" + "="*70)
+    print(f"✅ Rendered: {rendered}/{total} PNGs")
+    print(f"⏱️  Total time: {total_time:.1f} seconds")
+    print("="*70)
+
+if __name__ == "__main__":
+    main()